@@ -6,16 +6,26 @@ import wave
 import pyaudio
 import numpy as np
 import audioop
-import subprocess
 import re
 import digitalio
 import sys
+import atexit
+import queue
+import collections
+import heapq
+import struct
+import array
+import hashlib
+import concurrent.futures
+import io
+from dataclasses import dataclass
 
 # Load the .env file with the ChatGPT API key
 from dotenv import load_dotenv
 load_dotenv()
 
-from openai import OpenAI, APIConnectionError
+import httpx
+from openai import OpenAI, APIError, APIConnectionError, RateLimitError, DefaultHttpxClient
 
 import board
 import busio
@@ -33,12 +43,95 @@ USE_PI5 = True
 #  OPENAI CONFIGURATION
 # ================================================================
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# One pooled HTTP client for the whole process, so transcription, chat and
+# TTS reuse the same TCP/TLS session instead of handshaking on every call.
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]").
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_http_client = DefaultHttpxClient(
+    http2=HTTP2_AVAILABLE,
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=600),
+)
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http_client)
+atexit.register(_http_client.close)
+
+
+def prewarm_connection():
+    """
+    Open the pooled TLS connection to the API ahead of the first real call
+    (runs in a daemon thread). The answer is irrelevant, so any error is ignored.
+    """
+    try:
+        _http_client.head(f"{client.base_url}models")
+    except Exception:
+        pass
+
+
+# Extra attempts after a 429, on top of the SDK's own two short retries,
+# so one request is tried at most (2 + 1) * 3 = 9 times before giving up
+RATE_LIMIT_RETRIES = 2
+
+
+def rate_limit_delay(error):
+    """Seconds to wait after a RateLimitError: its retry-after header plus jitter."""
+    try:
+        delay = float(error.response.headers.get("retry-after", 1))
+    except (TypeError, ValueError):
+        delay = 1.0
+    return delay + random.random() * 0.2
+
+
+def call_with_retry(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs), waiting out rate limits up to RATE_LIMIT_RETRIES times."""
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except RateLimitError as e:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            delay = rate_limit_delay(e)
+            print(f"⏳ OpenAI rate limit hit; retrying in {delay:.1f}s")
+            time.sleep(delay)
+
 
 CHAT_MODEL = "gpt-4.1-mini"
+CHAT_MAX_TOKENS = 120  # hard cap on reply length (label + a few sentences)
+
+# System prompt, built once and shared by every chat request
+SYSTEM_PROMPT = (
+    "You are a calm, expressive AI. "
+    "Respond concisely in 1 sentence unless necessary. "
+    "Do NOT start with greetings like 'Hello', 'Hi', or 'How can I help you today?'. "
+    "Just answer the user's request directly. "
+    "Also output emotion as one of: happy, sad, neutral, angry, surprised. "
+    "Format: [emotion: <label>] <text>"
+)
+_SYS_MSG = {"role": "system", "content": SYSTEM_PROMPT}
+
+# Chat requests run on a worker so the main loop stays free while waiting
+_chat_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat")
+
 TTS_MODEL = "gpt-4o-mini-tts"
 VOICE_NAME = "echo"
 
+# TTS is requested as raw PCM (16-bit mono at 24 kHz) and resampled
+# in-process to the rate the USB speaker is driven at.
+TTS_SAMPLE_RATE = 24000
+PLAYBACK_RATE = 48000
+
+TTS_STREAM_CHUNK = 4096   # bytes per network read while streaming TTS
+TTS_PRIME_SECONDS = 0.1   # audio buffered before playback starts
+TTS_FIRST_CHUNK_TIMEOUT = 30.0  # give up on a sentence whose audio never starts
+
+# Fixed phrases (idle chatter) are synthesized once and replayed from disk
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
 
 # ================================================================
 #  AUDIO DEVICE CONFIGURATION
@@ -53,13 +146,23 @@ IDLE_PHRASES = [
 ]
 
 
+# Cached (input_index, output_index) from the first lookup. PortAudio reads
+# the device list once when _PA is created, so a later scan could never
+# find a device that was missing at startup; plug it in and restart.
+_AUDIO_DEVICE_CACHE = None
+
+
 def find_audio_devices():
-    p = pyaudio.PyAudio()
+    """Return (input_index, output_index), enumerating devices only once."""
+    global _AUDIO_DEVICE_CACHE
+    if _AUDIO_DEVICE_CACHE is not None:
+        return _AUDIO_DEVICE_CACHE
+
     input_index = None
     output_index = None
 
-    for i in range(p.get_device_count()):
-        info = p.get_device_info_by_index(i)
+    for i in range(_PA.get_device_count()):
+        info = _PA.get_device_info_by_index(i)
 
         name = info.get("name", "").lower()
 
@@ -73,8 +176,137 @@ def find_audio_devices():
             if "usb" in name or "audio" in name or "speaker" in name:
                 output_index = i
 
-    p.terminate()
-    return input_index, output_index
+    _AUDIO_DEVICE_CACHE = (input_index, output_index)
+    return _AUDIO_DEVICE_CACHE
+
+
+# One PyAudio instance and stream of each kind for the whole session.
+# Opening a PortAudio stream costs 100-300 ms, so they are reused between
+# utterances and only reopened when the requested format changes.
+_PA = pyaudio.PyAudio()
+_output_stream = None
+_output_stream_key = None
+_input_stream = None
+_input_stream_key = None
+
+# Output runs in callback mode: PortAudio pulls PLAYBACK_CHUNK frames at a
+# time from _playback_chunks on its own thread, so a GC pause or servo move
+# on the Python side can't starve the speaker. The callback publishes the
+# RMS of each chunk with the time it will be heard in _mouth_levels.
+PLAYBACK_CHUNK = 512
+_playback_chunks = collections.deque()
+_mouth_levels = collections.deque(maxlen=256)
+_output_frame_bytes = 2
+_output_latency = 0.0
+
+# Held by play_pcm for a whole utterance so the idle thread and the main
+# loop never share the stream. Waiting for the queue to drain gives up
+# PLAYBACK_DRAIN_SLACK seconds after the queued audio should have ended.
+_speaker_lock = threading.Lock()
+PLAYBACK_DRAIN_SLACK = 1.0
+
+
+def _playback_callback(in_data, frame_count, time_info, status):
+    """PortAudio callback: hand the next queued chunk to the speaker."""
+    wanted = frame_count * _output_frame_bytes
+    try:
+        data = _playback_chunks.popleft()
+    except IndexError:
+        return (bytes(wanted), pyaudio.paContinue)  # underrun: silence
+
+    if len(data) < wanted:
+        data += bytes(wanted - len(data))
+
+    _mouth_levels.append(
+        (time.monotonic() + _output_latency, audioop.rms(data, 2))
+    )
+    return (data, pyaudio.paContinue)
+
+
+def get_output_stream(rate, channels, sample_width, output_index):
+    """
+    Return the (stopped) callback output stream for the given format,
+    reusing the last one. play_pcm starts it once audio is queued.
+    """
+    global _output_stream, _output_stream_key, _output_frame_bytes, _output_latency
+
+    key = (rate, channels, sample_width, output_index)
+    if _output_stream is not None and _output_stream_key != key:
+        _output_stream.stop_stream()
+        _output_stream.close()
+        _output_stream = None
+
+    if _output_stream is None:
+        _output_frame_bytes = channels * sample_width
+        _output_stream = _PA.open(
+            format=_PA.get_format_from_width(sample_width),
+            channels=channels,
+            rate=rate,
+            output=True,
+            output_device_index=output_index,
+            frames_per_buffer=PLAYBACK_CHUNK,
+            stream_callback=_playback_callback,
+            start=False,
+        )
+        _output_stream_key = key
+        _output_latency = _output_stream.get_output_latency()
+
+    return _output_stream
+
+
+# Input also runs in callback mode: PortAudio's thread queues each captured
+# block, so a slow iteration of the detection loop can't overflow the device.
+_input_blocks = queue.Queue()
+
+
+def _capture_callback(in_data, frame_count, time_info, status):
+    """PortAudio callback: hand each captured block to record_audio."""
+    _input_blocks.put(in_data)
+    return (None, pyaudio.paContinue)
+
+
+def get_input_stream(rate, chunk, input_index):
+    """
+    Return the (stopped) 16-bit mono callback input stream, reusing the
+    last one. Blocks arrive on _input_blocks once it is started.
+    """
+    global _input_stream, _input_stream_key
+
+    key = (rate, chunk, input_index)
+    if _input_stream is not None and _input_stream_key != key:
+        _input_stream.stop_stream()
+        _input_stream.close()
+        _input_stream = None
+
+    if _input_stream is None:
+        _input_stream = _PA.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=rate,
+            input=True,
+            input_device_index=input_index,
+            frames_per_buffer=chunk,
+            stream_callback=_capture_callback,
+            start=False,
+        )
+        _input_stream_key = key
+
+    return _input_stream
+
+
+def close_audio():
+    """Close the shared streams and release PortAudio on shutdown."""
+    global _output_stream, _input_stream
+    for stream in (_output_stream, _input_stream):
+        if stream is not None:
+            stream.stop_stream()
+            stream.close()
+    _output_stream = None
+    _input_stream = None
+    _PA.terminate()
+
+
+atexit.register(close_audio)
 
 
 # ================================================================
@@ -114,8 +346,6 @@ BLINK_INTERVAL = (7, 12)
 BLINK_SPEED = 0.003
 BLINK_HOLD = 0.10
 
-last_blink_timestamp = 0.0
-
 # Servo pulse widths
 MIN_PULSE_MS = 0.5
 MAX_PULSE_MS = 2.5
@@ -125,15 +355,48 @@ PERIOD_MS = 20.0
 MOUTH_SMOOTHING = 0.6  # 0 = jumpy, 1 = smooth
 previous_audio_level = 0.0
 
-# Global state flags
-is_running = True
-is_speaking = False
-is_thinking = False
-is_armed = False  # True when button is ON (pressed), False when OFF
-is_offline = False  # True when OpenAI can't be reached
+# Global state flags, read and written from several threads: the main loop,
+# the idle-speech thread, TTS workers and the button callback. Each write
+# replaces a flag outright (never read-modify-write), so a single attribute
+# assignment is all that has to be atomic; no lock is taken. Slots keep the
+# lookups off the module dict.
+@dataclass(slots=True)
+class State:
+    is_running: bool = True
+    is_speaking: bool = False
+    is_thinking: bool = False
+    is_armed: bool = False  # True when button is ON (pressed), False when OFF
+    is_offline: bool = False  # True when OpenAI can't be reached
+    last_blink_timestamp: float = 0.0
 
-# Track servo angles
-current_servo_angles = {}
+
+state = State()
+
+# Background loops sleep on this instead of polling while the switch is OFF
+state_changed = threading.Condition()
+
+
+def notify_state_change():
+    """Wake threads blocked in wait_until_armed() after state.is_armed/state.is_running changes."""
+    with state_changed:
+        state_changed.notify_all()
+
+
+def wait_until_armed(timeout=1.0):
+    """
+    Block until the switch is ON or the program is stopping. Woken by
+    notify_state_change(); the timeout only guards against a missed notify.
+    """
+    with state_changed:
+        state_changed.wait_for(lambda: state.is_armed or not state.is_running, timeout)
+
+
+# Per-channel servo state as flat arrays indexed by channel number (0-5)
+SERVO_DIRS = (
+    DIR_LEFT_X, DIR_LEFT_Y, DIR_LEFT_BLINK,
+    DIR_RIGHT_X, DIR_RIGHT_Y, DIR_RIGHT_BLINK,
+)
+current_servo_angles = [None] * len(SERVO_DIRS)  # None = not yet positioned
 
 
 # ================================================================
@@ -163,7 +426,7 @@ if USE_PI5:
     pixels = Pi5PixelBuf(
         NEOPIXEL_PIN,
         NUM_PIXELS,
-        auto_write=True,
+        auto_write=False,  # show() is called explicitly
         byteorder="BRG",
     )
 
@@ -175,36 +438,63 @@ else:
     pixels = neopixel.NeoPixel(
         NEOPIXEL_PIN,
         NUM_PIXELS,
-        auto_write=True,
+        auto_write=False,  # show() is called explicitly
         pixel_order=neopixel.GRB,   # change if colors look off
     )
 
 
-def show_mouth(amplitude, color=(256, 256, 256)):
-    """Display mouth levels symmetrically based on amplitude."""
-    amplitude = max(0.0, min(1.0, amplitude))
-    num_lit = int(round(amplitude * NUM_PIXELS))
-
-    pixels.fill((0, 0, 0))
-
+def _build_mouth_lut():
+    """For every possible num_lit, which LEDs are on (symmetric from the center)."""
     center_left = NUM_PIXELS // 2 - 1
     center_right = NUM_PIXELS // 2
 
-    for i in range(num_lit // 2):
-        left_pos = center_left - i
-        right_pos = center_right + i
+    lut = []
+    for num_lit in range(NUM_PIXELS + 1):
+        mask = [False] * NUM_PIXELS
+        for i in range(num_lit // 2):
+            left_pos = center_left - i
+            right_pos = center_right + i
+
+            if 0 <= left_pos < NUM_PIXELS:
+                mask[left_pos] = True
+            if 0 <= right_pos < NUM_PIXELS:
+                mask[right_pos] = True
+        lut.append(tuple(mask))
+    return tuple(lut)
+
+
+MOUTH_LUT = _build_mouth_lut()
 
-        if 0 <= left_pos < NUM_PIXELS:
-            pixels[left_pos] = color
-        if 0 <= right_pos < NUM_PIXELS:
-            pixels[right_pos] = color
+# Raw transmit-buffer bytes per (num_lit, color), built on first use.
+# Both the Pi 5 and Pi 4 pixel objects are adafruit_pixelbuf.PixelBuf, so a
+# frame is rendered once through the normal API (which knows the byte
+# order) and after that copied straight into the buffer.
+_mouth_frames = {}
 
+
+def _mouth_frame(num_lit, color):
+    """Return the raw pixel buffer contents for num_lit LEDs of this color."""
+    frame = _mouth_frames.get((num_lit, color))
+    if frame is None:
+        pixels[:] = [color if lit else (0, 0, 0) for lit in MOUTH_LUT[num_lit]]
+        frame = bytes(pixels._post_brightness_buffer)
+        _mouth_frames[(num_lit, color)] = frame
+    return frame
+
+
+def show_mouth(amplitude, color=(255, 255, 255)):
+    """Display mouth levels symmetrically based on amplitude."""
+    amplitude = max(0.0, min(1.0, amplitude))
+    num_lit = int(round(amplitude * NUM_PIXELS))
+
+    # One buffer copy + one transmit instead of fill + per-pixel writes
+    pixels._post_brightness_buffer[:] = _mouth_frame(num_lit, color)
     pixels.show()
 
 
 def clear_mouth():
     """Turn off all mouth LEDs."""
-    pixels.fill((0, 0, 0))
+    pixels._post_brightness_buffer[:] = _mouth_frame(0, (0, 0, 0))
     pixels.show()
 
 
@@ -226,47 +516,275 @@ listen_led = digitalio.DigitalInOut(LISTEN_LED_PIN)
 listen_led.direction = digitalio.Direction.OUTPUT
 listen_led.value = False
 
+# GPIO writes go through Blinka and a syscall each, and the audio loops
+# set the LED ~40-90 times a second, so remember what it already shows.
+_listen_led_value = False
+
+
+def set_listen_led(value):
+    """Drive the listen LED, skipping the write if it is already in that state."""
+    global _listen_led_value
+
+    if value != _listen_led_value:
+        listen_led.value = value
+        _listen_led_value = value
+
+
+# The switch position is tracked with GPIO edge callbacks, so nothing has
+# to poll it: armed_event is set while the switch is ON.
+armed_event = threading.Event()
+BUTTON_DEBOUNCE_MS = 20
+
+_button_callback = None  # keeps the lgpio callback handle alive
+
+
+def _on_listen_button_change(button_value):
+    """Edge callback. button_value is the raw pin level (True = OFF)."""
+
+    button_on = not button_value
+    if button_on == armed_event.is_set():
+        return  # bounce or repeated level, nothing changed
+
+    state.is_armed = button_on
+    update_listen_led_state()  # LED follows the switch right away
+
+    if button_on:
+        armed_event.set()
+        set_eyelids_open()    # waking up
+    else:
+        armed_event.clear()
+        set_eyelids_closed()  # going to sleep
+
+    notify_state_change()
+
+
+def start_button_events():
+    """Register edge callbacks on the listen button (lgpio on Pi 5, RPi.GPIO on Pi 4)."""
+    global _button_callback
+
+    pin = BUTTON_PIN.id
+
+    if USE_PI5:
+        import lgpio
+        from adafruit_blinka.microcontroller.generic_linux.lgpio_pin import CHIP
+
+        # Re-claim the line Blinka opened as an alert source, keeping the pull-up
+        lgpio.gpio_free(CHIP, pin)
+        lgpio.gpio_claim_alert(CHIP, pin, lgpio.BOTH_EDGES, lgpio.SET_PULL_UP)
+        lgpio.gpio_set_debounce_micros(CHIP, pin, BUTTON_DEBOUNCE_MS * 1000)
+
+        def on_edge(chip, gpio, level, tick):
+            if level in (0, 1):  # 2 = watchdog timeout, not an edge
+                _on_listen_button_change(bool(level))
+
+        _button_callback = lgpio.callback(CHIP, pin, lgpio.BOTH_EDGES, on_edge)
+    else:
+        import RPi.GPIO as GPIO
+
+        GPIO.add_event_detect(
+            pin,
+            GPIO.BOTH,
+            callback=lambda channel: _on_listen_button_change(bool(GPIO.input(channel))),
+            bouncetime=BUTTON_DEBOUNCE_MS
+        )
+
 
 # ================================================================
 #  SERVO + EYE CONTROL
 # ================================================================
 
-def set_servo_angle(channel, direction, angle):
-    """Send corrected angle to PCA9685 servo."""
+# First PWM register; each channel has 4 bytes (ON_L, ON_H, OFF_L, OFF_H)
+# and the PCA9685 auto-increments, so consecutive channels can be written
+# in one I²C transaction.
+PCA_LED0_ON_L = 0x06
+
+
+def angle_to_duty(direction, angle):
+    """Convert a (direction-corrected) servo angle to a 16-bit duty cycle."""
     if direction == -1:
         angle = 180 - angle
 
     pulse_range = MAX_PULSE_MS - MIN_PULSE_MS
     pulse_width = MIN_PULSE_MS + (pulse_range * angle / 180.0)
-    duty_cycle = int((pulse_width / PERIOD_MS) * 65535)
+    return int((pulse_width / PERIOD_MS) * 65535)
+
+
+# Precomputed duty cycles: DUTY_LUT[0 if direction == 1 else 1][angle - DUTY_LUT_MIN].
+# Covers the trimmed blink angles below 0° as well as 0–180°; anything
+# outside the table falls back to angle_to_duty().
+DUTY_LUT_MIN = -45
+DUTY_LUT_MAX = 225
+DUTY_LUT = tuple(
+    array.array("H", [angle_to_duty(direction, a) for a in range(DUTY_LUT_MIN, DUTY_LUT_MAX + 1)])
+    for direction in (1, -1)
+)
+
+# The same rows per channel, with each servo's direction already folded in
+CHANNEL_DUTY_LUT = tuple(DUTY_LUT[0 if d == 1 else 1] for d in SERVO_DIRS)
+
+
+def lookup_duty(direction, angle):
+    """Duty cycle for an integer angle, from DUTY_LUT when in range."""
+    if DUTY_LUT_MIN <= angle <= DUTY_LUT_MAX:
+        return DUTY_LUT[0 if direction == 1 else 1][angle - DUTY_LUT_MIN]
+    return angle_to_duty(direction, angle)
+
+
+def _pwm_register_values(duty_cycle):
+    """(ON, OFF) register values for a duty cycle, encoded like adafruit_pca9685."""
+    if duty_cycle == 0xFFFF:
+        return 0x1000, 0          # fully on
+    if duty_cycle < 0x0010:
+        return 0, 0x1000          # fully off
+    return 0, duty_cycle >> 4     # 16-bit -> 12-bit
+
 
-    pca.channels[channel].duty_cycle = duty_cycle
+# Last duty cycle written to each channel. Lets one burst span channels
+# that did not change this step (None = never written, can't be spanned).
+_channel_duty = [None] * 16
 
+# Reused burst buffer: register address + 4 bytes (ON, OFF) per channel
+_pwm_burst = bytearray(1 + 4 * 16)
 
-def move_servos_together(angle_targets, current_angles):
-    """Smoothly move several servos together."""
-    max_steps = 0
-    for ch, (_, target) in angle_targets.items():
-        max_steps = max(max_steps, abs(target - current_angles.get(ch, target)))
+# Serializes PCA9685 access between the eye thread and the main thread.
+# Blinka's bus try_lock alone is a check-then-set, not a real lock.
+_i2c_lock = threading.Lock()
 
-    if max_steps == 0:
+
+def write_duty_cycles(channel_duties):
+    """
+    Write {channel: duty_cycle} to the PCA9685. Everything from the lowest
+    to the highest changed channel goes out as one auto-increment burst,
+    re-sending the last known value for unchanged channels in between.
+    """
+    if not channel_duties:
         return
 
-    for step in range(0, max_steps + 1, MOVE_STEP):
-        for ch, (direction, target) in angle_targets.items():
-            start = current_angles.get(ch, target)
-            if start == target:
+    # Lock and device are held for the whole update; the shadow values
+    # and burst buffer are shared with the other servo-driving thread
+    with _i2c_lock, pca.i2c_device as i2c:
+        for ch, duty in channel_duties.items():
+            _channel_duty[ch] = duty
+
+        first = min(channel_duties)
+        last = max(channel_duties)
+        run_start = first
+
+        for ch in range(first, last + 2):
+            if ch <= last and _channel_duty[ch] is not None:
                 continue
 
-            t = min(1.0, step / max_steps)
-            new_angle = int(start + (target - start) * t)
+            # Flush the run [run_start, ch) and skip the unknown channel
+            if ch > run_start:
+                _pwm_burst[0] = PCA_LED0_ON_L + 4 * run_start
+                offset = 1
+                for run_ch in range(run_start, ch):
+                    struct.pack_into(
+                        "<HH", _pwm_burst, offset,
+                        *_pwm_register_values(_channel_duty[run_ch])
+                    )
+                    offset += 4
+
+                i2c.write(_pwm_burst, end=offset)
 
-            set_servo_angle(ch, direction, new_angle)
+            run_start = ch + 1
 
-        time.sleep(MOVE_DELAY)
 
-    for ch, (_, target) in angle_targets.items():
-        current_angles[ch] = target
+def set_servo_angles(updates):
+    """Send several (channel, direction, angle) updates in one batch."""
+    write_duty_cycles({
+        channel: lookup_duty(direction, angle)
+        for channel, direction, angle in updates
+    })
+
+
+def set_channel_angles(updates):
+    """
+    Send several (channel, angle) updates in one batch, using each channel's
+    SERVO_DIRS direction. Angles must lie within DUTY_LUT_MIN..DUTY_LUT_MAX.
+    """
+    write_duty_cycles({
+        channel: CHANNEL_DUTY_LUT[channel][angle - DUTY_LUT_MIN]
+        for channel, angle in updates
+    })
+
+
+SERVO_RT_PRIORITY = 50  # SCHED_FIFO priority for the eye-animation thread
+
+
+def enable_realtime_scheduling(priority=SERVO_RT_PRIORITY):
+    """
+    Put the calling thread on SCHED_FIFO so servo steps aren't delayed by
+    ordinary tasks. Needs root or CAP_SYS_NICE; otherwise keeps running
+    under the normal scheduler.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+    except (AttributeError, OSError) as e:
+        print(f"⚠️ Realtime scheduling unavailable ({e}); using default scheduler.")
+
+
+def sleep_until_ns(deadline_ns):
+    """Sleep until an absolute time.monotonic_ns() deadline (no-op if already past)."""
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > 0:
+        time.sleep(remaining / 1e9)
+
+
+def play_frames(frames, interval, deadline_ns=None):
+    """
+    Send precomputed frames of (channel, angle) updates `interval` seconds
+    apart on absolute monotonic_ns deadlines. A frame whose slot has already
+    passed is dropped (the final frame is always sent), so a stall cuts the
+    motion short instead of stretching it. Returns the next deadline.
+    """
+    interval_ns = int(interval * 1e9)
+    if deadline_ns is None:
+        deadline_ns = time.monotonic_ns()
+
+    last = len(frames) - 1
+    for i, frame in enumerate(frames):
+        deadline_ns += interval_ns
+        if i < last and time.monotonic_ns() >= deadline_ns:
+            continue  # late: skip straight to the frame that is due
+
+        set_channel_angles(frame)
+        sleep_until_ns(deadline_ns)
+
+    return deadline_ns
+
+
+def move_servos_together(targets):
+    """Smoothly move several servos together. targets: {channel: angle}."""
+    # Parallel arrays of just the channels that actually move
+    channels = []
+    starts = []
+    deltas = []
+    for ch, target in targets.items():
+        start = current_servo_angles[ch]
+        if start is None or start == target:
+            continue
+        channels.append(ch)
+        starts.append(start)
+        deltas.append(target - start)
+
+    if not channels:
+        for ch, target in targets.items():
+            current_servo_angles[ch] = target
+        return
+
+    max_steps = max(abs(delta) for delta in deltas)
+    moving = range(len(channels))
+
+    # Whole trajectory up front, one batch per step, interpolated in integers
+    frames = [
+        [(channels[i], starts[i] + deltas[i] * step // max_steps) for i in moving]
+        for step in range(0, max_steps + 1, MOVE_STEP)
+    ]
+    play_frames(frames, MOVE_DELAY)
+
+    for ch, target in targets.items():
+        current_servo_angles[ch] = target
 
 
 def random_eye_position(scale=1.0):
@@ -283,241 +801,248 @@ def random_eye_position(scale=1.0):
     return x, y
 
 
-def blink_eyes(probability=1.0):
-    """Full natural blink with staggered eyelid motion."""
-    global is_armed
-    if not is_armed:
-        return
-
-    if random.random() > probability:
-        return
-
-    left_open = BLINK_OPEN_LEFT
-    right_open = BLINK_OPEN_RIGHT
-    closed = BLINK_LIMITS[1]
-
+def blink_trajectories(left_open, right_open, closed, side_offset_steps):
+    """
+    Per-step left and right eyelid angles for the closing half of a blink,
+    as two array('h') trajectories; the opening half is the same reversed.
+    """
     left_range = closed - left_open
     right_range = closed - right_open
 
+    left = array.array("h")
+    right = array.array("h")
+
     steps_total = max(left_range, right_range)
     if steps_total <= 0:
-        return
-
-    side_offset_steps = int(round(BLINK_SIDE_DELAY / BLINK_SPEED))
+        return left, right
 
-    # Closing motion
     for step in range(0, steps_total + 1):
         left_progress = min(step, left_range) / left_range if left_range > 0 else 1.0
 
         right_step_corrected = max(0, step - side_offset_steps)
         right_progress = min(right_step_corrected, right_range) / right_range if right_range > 0 else 1.0
 
-        left_angle = int(left_open + left_progress * left_range)
-        right_angle = int(right_open + right_progress * right_range)
+        left.append(int(left_open + left_progress * left_range))
+        right.append(int(right_open + right_progress * right_range))
 
-        set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, left_angle)
-        set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, right_angle)
+    return left, right
 
-        time.sleep(BLINK_SPEED)
 
-    time.sleep(BLINK_HOLD)
+def wink_trajectory(open_angle, closed, steps):
+    """Per-step angles for the closing half of a single-eyelid wink."""
+    if steps <= 0:
+        return array.array("h")
+    return array.array("h", (
+        int(open_angle + (closed - open_angle) * (step / steps))
+        for step in range(steps + 1)
+    ))
 
-    # Opening motion
-    for step in range(steps_total, -1, -1):
-        left_progress = min(step, left_range) / left_range if left_range > 0 else 1.0
 
-        right_step_corrected = max(0, step - side_offset_steps)
-        right_progress = min(right_step_corrected, right_range) / right_range if right_range > 0 else 1.0
+# Eyelid channels a set of trajectories drives, in trajectory order
+LEFT_LID = (LEFT_BLINK,)
+RIGHT_LID = (RIGHT_BLINK,)
+BOTH_LIDS = LEFT_LID + RIGHT_LID
 
-        left_angle = int(left_open + left_progress * left_range)
-        right_angle = int(right_open + right_progress * right_range)
 
-        set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, left_angle)
-        set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, right_angle)
+def lid_frames(lids, trajectories):
+    """(closing, opening) play_frames() sequences for per-lid trajectories."""
+    closing = tuple(tuple(zip(lids, angles)) for angles in zip(*trajectories))
+    return closing, closing[::-1]
 
-        time.sleep(BLINK_SPEED)
 
+# The trims are fixed, so every blink and wink is built once at import
+_LEFT_BLINK_TRAJ, _RIGHT_BLINK_TRAJ = blink_trajectories(
+    BLINK_OPEN_LEFT,
+    BLINK_OPEN_RIGHT,
+    BLINK_LIMITS[1],
+    int(round(BLINK_SIDE_DELAY / BLINK_SPEED)),
+)
+_BLINK_FRAMES = lid_frames(BOTH_LIDS, (_LEFT_BLINK_TRAJ, _RIGHT_BLINK_TRAJ))
+
+# Both winks use the left lid's travel as the step count
+_WINK_STEPS = abs(BLINK_LIMITS[1] - BLINK_OPEN_LEFT)
+_LEFT_WINK_FRAMES = lid_frames(
+    LEFT_LID, (wink_trajectory(BLINK_OPEN_LEFT, BLINK_LIMITS[1], _WINK_STEPS),)
+)
+_RIGHT_WINK_FRAMES = lid_frames(
+    RIGHT_LID, (wink_trajectory(BLINK_OPEN_RIGHT, BLINK_LIMITS[1], _WINK_STEPS),)
+)
 
-def wink():
-    """Random single-eye wink."""
 
-    global last_blink_timestamp, is_armed
-    if not is_armed:
+def play_blink(frames):
+    """Play (closing, opening) frames with a BLINK_HOLD pause in between."""
+    closing, opening = frames
+    if not closing:
         return
 
-    last_blink_timestamp = time.time()
-    chosen_side = random.choice(["left", "right"])
+    deadline_ns = play_frames(closing, BLINK_SPEED)
+    deadline_ns += int(BLINK_HOLD * 1e9)
+    sleep_until_ns(deadline_ns)
+    play_frames(opening, BLINK_SPEED, deadline_ns)
 
-    left_open = BLINK_OPEN_LEFT
-    right_open = BLINK_OPEN_RIGHT
-    closed = BLINK_LIMITS[1]
 
-    steps = abs(closed - left_open)
+def blink_eyes(probability=1.0):
+    """Full natural blink with staggered eyelid motion."""
+    if not state.is_armed:
+        return
 
-    # LEFT wink
-    if chosen_side == "left":
-        for step in range(steps + 1):
-            angle = int(left_open + (closed - left_open) * (step / steps))
-            set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, angle)
-            time.sleep(BLINK_SPEED)
+    if random.random() > probability:
+        return
+
+    play_blink(_BLINK_FRAMES)
 
-        time.sleep(BLINK_HOLD)
 
-        for step in range(steps, -1, -1):
-            angle = int(left_open + (closed - left_open) * (step / steps))
-            set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, angle)
-            time.sleep(BLINK_SPEED)
+def wink():
+    """Random single-eye wink."""
 
-    else:  # RIGHT wink
-        for step in range(steps + 1):
-            angle = int(right_open + (closed - right_open) * (step / steps))
-            set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, angle)
-            time.sleep(BLINK_SPEED)
+    if not state.is_armed:
+        return
 
-        time.sleep(BLINK_HOLD)
+    state.last_blink_timestamp = time.time()
+    chosen_side = random.choice(["left", "right"])
 
-        for step in range(steps, -1, -1):
-            angle = int(right_open + (closed - right_open) * (step / steps))
-            set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, angle)
-            time.sleep(BLINK_SPEED)
+    if chosen_side == "left":
+        play_blink(_LEFT_WINK_FRAMES)
+    else:
+        play_blink(_RIGHT_WINK_FRAMES)
 
-    last_blink_timestamp = time.time()
+    state.last_blink_timestamp = time.time()
 
 
 def blink_twice():
     """Double blink."""
-    global last_blink_timestamp, is_armed
-    if not is_armed:
+    if not state.is_armed:
         return
 
     for _ in range(2):
         blink_eyes(probability=1.0)
-        last_blink_timestamp = time.time()
+        state.last_blink_timestamp = time.time()
         time.sleep(0.3)
 
 
-def eyes_idle_loop():
-    """Background idle movement and blinking for eyes."""
-    global is_running, is_speaking, is_thinking, last_blink_timestamp, is_armed, is_offline
-
-    next_blink = time.time() + random.uniform(*BLINK_INTERVAL)
-
-    while is_running:
+def _glance(scale):
+    """Move both eyes together to a random point within `scale` of the range."""
+    new_x, new_y = random_eye_position(scale=scale)
+    move_servos_together({
+        LEFT_X: new_x,
+        LEFT_Y: new_y,
+        RIGHT_X: new_x,
+        RIGHT_Y: new_y
+    })
 
-        # If no internet, hold the offline pose (set_offline_face already did it)
-        if is_offline:
-            time.sleep(0.1)
-            continue
 
-        if not is_armed:
-            time.sleep(0.1)
-            continue
+def eyes_step(next_blink):
+    """
+    One round of idle eye movement and blinking. Returns (seconds until the
+    next round, updated idle-blink time).
+    """
+    # If no internet, hold the offline pose (set_offline_face already did it)
+    if state.is_offline:
+        return 0.1, next_blink
 
-        now = time.time()
+    now = time.time()
 
-        # THINKING MODE
-        if is_thinking:
-            for _ in range(2):
-                new_x, new_y = random_eye_position(scale=0.5)
-                targets = {
-                    LEFT_X: (DIR_LEFT_X, new_x),
-                    LEFT_Y: (DIR_LEFT_Y, new_y),
-                    RIGHT_X: (DIR_RIGHT_X, new_x),
-                    RIGHT_Y: (DIR_RIGHT_Y, new_y)
-                }
+    # THINKING MODE
+    if state.is_thinking:
+        _glance(0.5)
 
-                move_servos_together(targets, current_servo_angles)
+        if random.random() < 0.3 and now - state.last_blink_timestamp > 0.2:
+            blink_eyes(probability=1.0)
+            state.last_blink_timestamp = time.time()
 
-                if random.random() < 0.3 and now - last_blink_timestamp > 0.2:
-                    blink_eyes(probability=1.0)
-                    last_blink_timestamp = time.time()
+        return 1.0, next_blink
 
-                time.sleep(1)
+    # SPEAKING MODE
+    if state.is_speaking:
+        _glance(0.3)
 
-        # SPEAKING MODE
-        elif is_speaking:
-            new_x, new_y = random_eye_position(scale=0.3)
-            targets = {
-                LEFT_X: (DIR_LEFT_X, new_x),
-                LEFT_Y: (DIR_LEFT_Y, new_y),
-                RIGHT_X: (DIR_RIGHT_X, new_x),
-                RIGHT_Y: (DIR_RIGHT_Y, new_y)
-            }
+        if random.random() < 0.2 and now - state.last_blink_timestamp > 0.2:
+            blink_eyes(probability=1.0)
+            state.last_blink_timestamp = time.time()
 
-            move_servos_together(targets, current_servo_angles)
+        return random.uniform(0.8, 1.8), next_blink
 
-            if random.random() < 0.2 and now - last_blink_timestamp > 0.2:
-                blink_eyes(probability=1.0)
-                last_blink_timestamp = time.time()
+    # IDLE MODE
+    _glance(1.0)
 
-            time.sleep(random.uniform(0.8, 1.8))
+    if now >= next_blink:
+        blink_eyes(probability=1.0)
+        state.last_blink_timestamp = time.time()
+        next_blink = time.time() + random.uniform(*BLINK_INTERVAL)
 
-        # IDLE MODE
-        else:
-            new_x, new_y = random_eye_position(scale=1.0)
-            targets = {
-                LEFT_X: (DIR_LEFT_X, new_x),
-                LEFT_Y: (DIR_LEFT_Y, new_y),
-                RIGHT_X: (DIR_RIGHT_X, new_x),
-                RIGHT_Y: (DIR_RIGHT_Y, new_y)
-            }
+    return random.uniform(1, 3), next_blink
 
-            move_servos_together(targets, current_servo_angles)
 
-            if now >= next_blink:
-                blink_eyes(probability=1.0)
-                last_blink_timestamp = time.time()
-                next_blink = time.time() + random.uniform(*BLINK_INTERVAL)
+def led_step():
+    """
+    LED behavior while armed (returns seconds until the next update):
+    - BLINK when busy (thinking or speaking)
+    - SOLID ON when ready for input
+    """
+    # Busy (cannot accept input): blink
+    if state.is_thinking or state.is_speaking:
+        set_listen_led(not _listen_led_value)
+        return 0.3
 
-            time.sleep(random.uniform(1, 3))
+    # Ready: solid ON
+    set_listen_led(True)
+    return 0.1
 
 
-def led_blink_loop():
+def animation_loop():
     """
-    LED behavior:
-    - OFF if not armed
-    - BLINK when busy (thinking or speaking)
-    - SOLID ON when ready for input
+    Single background thread driving the eyes and the listen LED. The next
+    due time of each task sits in a small heap; the loop sleeps until the
+    earliest one, runs it and pushes it back with the delay it returns.
     """
-    global is_running, is_thinking, is_speaking, listen_led, is_armed
+    enable_realtime_scheduling()
 
-    while is_running:
-        if not is_armed:
-            listen_led.value = False
-            time.sleep(0.1)
+    next_blink = time.time() + random.uniform(*BLINK_INTERVAL)
+
+    def run_eyes():
+        nonlocal next_blink
+        delay, next_blink = eyes_step(next_blink)
+        return delay
+
+    now_ns = time.monotonic_ns()
+    # (deadline_ns, tie-break order, task)
+    schedule = [(now_ns, 0, run_eyes), (now_ns, 1, led_step)]
+
+    while state.is_running:
+        # Switch OFF: LED off, then sleep until it flips back ON.
+        # Both tasks are overdue when it does, so they run right away.
+        if not state.is_armed:
+            set_listen_led(False)
+            wait_until_armed()
             continue
 
-        # Busy (cannot accept input): blink
-        if is_thinking or is_speaking:
-            listen_led.value = True
-            time.sleep(0.3)
-            listen_led.value = False
-            time.sleep(0.3)
+        deadline_ns, order, task = schedule[0]
+        sleep_until_ns(deadline_ns)
+
+        # The switch may have flipped OFF while we slept: don't move the eyes
+        if not state.is_armed:
             continue
 
-        # Ready: solid ON
-        listen_led.value = True
-        time.sleep(0.1)
+        delay = task()
+        heapq.heapreplace(schedule, (time.monotonic_ns() + int(delay * 1e9), order, task))
 
 
 def idle_speech_loop():
-    global is_running, is_speaking, is_thinking, is_armed
-
     last_spoke_time = time.time()
     IDLE_INTERVAL = 90   # seconds of silence before it talks (adjust here)
 
-    while is_running:
+    while state.is_running:
         time.sleep(1)
 
         # Do NOT speak while the bot is:
         # - Sleeping (switch off)
         # - Thinking
         # - Speaking
-        if not is_armed:
+        if not state.is_armed:
             last_spoke_time = time.time()
             continue
 
-        if is_thinking or is_speaking:
+        if state.is_thinking or state.is_speaking:
             last_spoke_time = time.time()
             continue
 
@@ -525,7 +1050,11 @@ def idle_speech_loop():
         if time.time() - last_spoke_time > IDLE_INTERVAL:
             phrase = random.choice(IDLE_PHRASES)
             print(f"[Idle message] {phrase}")
-            speak_text(phrase, color=(0, 255, 0))
+            cached_path = tts_cache_path(phrase)
+            if os.path.exists(cached_path):
+                speak_cached(cached_path, color=(0, 255, 0))
+            else:
+                speak_text(phrase, color=(0, 255, 0))
             last_spoke_time = time.time()
 
 
@@ -537,22 +1066,20 @@ def center_eyes():
     left_blink_open = BLINK_OPEN_LEFT
     right_blink_open = BLINK_OPEN_RIGHT
 
-    current_servo_angles.update({
-        LEFT_X: neutral_x,
-        LEFT_Y: neutral_y,
-        LEFT_BLINK: left_blink_open,
-        RIGHT_X: neutral_x,
-        RIGHT_Y: neutral_y,
-        RIGHT_BLINK: right_blink_open
-    })
-
-    set_servo_angle(LEFT_X, DIR_LEFT_X, neutral_x)
-    set_servo_angle(LEFT_Y, DIR_LEFT_Y, neutral_y)
-    set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, left_blink_open)
+    current_servo_angles[:] = [
+        neutral_x, neutral_y, left_blink_open,
+        neutral_x, neutral_y, right_blink_open,
+    ]
 
-    set_servo_angle(RIGHT_X, DIR_RIGHT_X, neutral_x)
-    set_servo_angle(RIGHT_Y, DIR_RIGHT_Y, neutral_y)
-    set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, right_blink_open)
+    # Channels 0-5 are consecutive, so this is a single I²C burst
+    set_servo_angles((
+        (LEFT_X, DIR_LEFT_X, neutral_x),
+        (LEFT_Y, DIR_LEFT_Y, neutral_y),
+        (LEFT_BLINK, DIR_LEFT_BLINK, left_blink_open),
+        (RIGHT_X, DIR_RIGHT_X, neutral_x),
+        (RIGHT_Y, DIR_RIGHT_Y, neutral_y),
+        (RIGHT_BLINK, DIR_RIGHT_BLINK, right_blink_open),
+    ))
 
 
 def set_eyelids_closed():
@@ -560,8 +1087,10 @@ def set_eyelids_closed():
     closed = BLINK_LIMITS[1]
 
     # 1. Drive eyelids to the closed angle
-    set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, closed)
-    set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, closed)
+    set_servo_angles((
+        (LEFT_BLINK, DIR_LEFT_BLINK, closed),
+        (RIGHT_BLINK, DIR_RIGHT_BLINK, closed),
+    ))
     current_servo_angles[LEFT_BLINK] = closed
     current_servo_angles[RIGHT_BLINK] = closed
 
@@ -569,16 +1098,17 @@ def set_eyelids_closed():
     time.sleep(0.3)  # tweak 0.2–0.4s if needed
 
     # 3. Then relax the servos by turning off PWM on those channels
-    pca.channels[LEFT_BLINK].duty_cycle = 0
-    pca.channels[RIGHT_BLINK].duty_cycle = 0
+    write_duty_cycles({LEFT_BLINK: 0, RIGHT_BLINK: 0})
 
 
 def set_eyelids_open():
     """Open both eyelids to normal trim (awake state)."""
     left_open = BLINK_OPEN_LEFT
     right_open = BLINK_OPEN_RIGHT
-    set_servo_angle(LEFT_BLINK, DIR_LEFT_BLINK, left_open)
-    set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, right_open)
+    set_servo_angles((
+        (LEFT_BLINK, DIR_LEFT_BLINK, left_open),
+        (RIGHT_BLINK, DIR_RIGHT_BLINK, right_open),
+    ))
     current_servo_angles[LEFT_BLINK] = left_open
     current_servo_angles[RIGHT_BLINK] = right_open
 
@@ -589,10 +1119,9 @@ def set_offline_face():
     - Cross-eyed
     - Red mouth blink
     """
-    global is_offline, is_thinking, is_speaking
-    is_offline = True
-    is_thinking = False
-    is_speaking = False
+    state.is_offline = True
+    state.is_thinking = False
+    state.is_speaking = False
 
     # Cross-eye pose: left eye looks right, right eye looks left
     neutral_y = (Y_LIMITS[0] + Y_LIMITS[1]) // 2
@@ -600,12 +1129,12 @@ def set_offline_face():
     right_x_cross = X_LIMITS[0]  # leftmost
 
     targets = {
-        LEFT_X: (DIR_LEFT_X, left_x_cross),
-        LEFT_Y: (DIR_LEFT_Y, neutral_y),
-        RIGHT_X: (DIR_RIGHT_X, right_x_cross),
-        RIGHT_Y: (DIR_RIGHT_Y, neutral_y),
+        LEFT_X: left_x_cross,
+        LEFT_Y: neutral_y,
+        RIGHT_X: right_x_cross,
+        RIGHT_Y: neutral_y,
     }
-    move_servos_together(targets, current_servo_angles)
+    move_servos_together(targets)
 
     # Make sure eyelids are open so the pose is visible
     set_eyelids_open()
@@ -622,24 +1151,27 @@ def set_offline_face():
 #  AUDIO RECORDING + TRANSCRIPTION
 # ================================================================
 
-def transcribe_audio(filename):
-    """Use Whisper API to convert audio to text."""
+def transcribe_audio(audio_file):
+    """Use Whisper API to convert audio (a named WAV file object) to text."""
     print("🧠 Transcribing...")
 
     try:
-        with open(filename, "rb") as audio_file:
-            result = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
+        # Sent as (name, bytes) so a rate-limit retry re-uploads the whole file
+        result = call_with_retry(
+            client.audio.transcriptions.create,
+            model="whisper-1",
+            file=(audio_file.name, audio_file.getvalue())
+        )
         # If we got here, internet is working again
-        global is_offline
-        is_offline = False
+        state.is_offline = False
         return result.text.strip()
     except APIConnectionError:
         print("❌ No internet: cannot reach OpenAI for transcription. Check Wi-Fi.")
         set_offline_face()
         return ""
+    except RateLimitError:
+        print("⚠️ OpenAI rate limit: transcription skipped.")
+        return ""
 
 
 def is_meaningful_text(text: str) -> bool:
@@ -691,13 +1223,12 @@ def is_meaningful_text(text: str) -> bool:
 
 def record_audio(filename="input.wav", threshold=2400, silence_duration=0.6):
     """
-    Voice-activated audio recorder:
+    Voice-activated audio recorder, returning the WAV as an in-memory file
+    (BytesIO named `filename`) so nothing is written to the SD card:
       - Starts when RMS > threshold
       - Stops when RMS < threshold for silence_duration seconds
       - Aborts immediately if the listen button is turned OFF
     """
-    audio_interface = pyaudio.PyAudio()
-
     RATE = 44100
     CHUNK = 1024
 
@@ -706,31 +1237,37 @@ def record_audio(filename="input.wav", threshold=2400, silence_duration=0.6):
         print("❌ No microphone found.")
         return None
 
-    stream = audio_interface.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=RATE,
-        input=True,
-        input_device_index=input_index,
-        frames_per_buffer=CHUNK
-    )
+    stream = get_input_stream(RATE, CHUNK, input_index)
+
+    # Drop anything left over from the previous turn, then start capturing
+    while not _input_blocks.empty():
+        _input_blocks.get_nowait()
+    stream.start_stream()
 
     print("🎤 Listening for speech...")
 
-    frames = []
+    # One growing buffer instead of a list of small chunks joined at the end
+    frames = bytearray()
     recording_started = False
-    silence_start = None
+    # Silence is measured in captured samples, not wall-clock time, so a
+    # backlog in the queue can't cut a recording short
+    silence_frames = 0
+    silence_limit = int(silence_duration * RATE)
 
     try:
         while True:
             update_listen_led_state()
 
             # Abort if button turned off
-            if listen_button.value:
+            if not armed_event.is_set():
                 print("🔕 Button turned off — cancelling recording.")
                 break
 
-            data = stream.read(CHUNK, exception_on_overflow=False)
+            try:
+                data = _input_blocks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
             rms = audioop.rms(data, 2)
 
             if not recording_started:
@@ -738,69 +1275,340 @@ def record_audio(filename="input.wav", threshold=2400, silence_duration=0.6):
                 if rms >= threshold:
                     print("🛑 Recording started!")
                     recording_started = True
-                    frames.append(data)
+                    frames += data
                 continue
 
             # Once recording has started:
-            frames.append(data)
+            frames += data
 
             # Detect silence
             if rms < threshold:
-                if silence_start is None:
-                    silence_start = time.time()
-                elif time.time() - silence_start >= silence_duration:
+                silence_frames += len(data) // 2
+                if silence_frames >= silence_limit:
                     print("🛑 Silence detected — stopping.")
                     break
             else:
-                silence_start = None
+                silence_frames = 0
 
     except KeyboardInterrupt:
         print("\n🛑 Recording interrupted.")
 
     print("🛑 Finished recording.")
 
+    # Stop (but keep) the stream so no stale audio piles up between turns
     stream.stop_stream()
-    stream.close()
-    audio_interface.terminate()
 
     if not frames:
         print("⚠️ No audio captured.")
         return None
 
-    with wave.open(filename, 'wb') as wf:
+    wav_file = io.BytesIO()
+    wav_file.name = filename  # the upload uses this to name the file
+
+    with wave.open(wav_file, 'wb') as wf:
         wf.setnchannels(1)
-        wf.setsampwidth(audio_interface.get_sample_size(pyaudio.paInt16))
+        wf.setsampwidth(_PA.get_sample_size(pyaudio.paInt16))
         wf.setframerate(RATE)
-        wf.writeframes(b"".join(frames))
+        wf.writeframes(frames)
+
+    wav_file.seek(0)
+    return wav_file
+
+
+def _download_tts(response, audio_queue):
+    """Producer: push raw PCM chunks from the TTS response onto the queue."""
+    try:
+        for chunk in response.iter_bytes(TTS_STREAM_CHUNK):
+            audio_queue.put(chunk)
+    except Exception as e:
+        print(f"⚠️ TTS stream interrupted: {e}")
+    finally:
+        audio_queue.put(None)  # end of stream
+
+
+def _iter_pcm_blocks(audio_queue, block_bytes, prime_bytes, first_chunk=b""):
+    """
+    Yield fixed-size PCM blocks from a queue of byte chunks ended by None
+    (first_chunk is data already taken off the queue). Nothing is yielded
+    until prime_bytes have arrived, so playback does not start only to
+    underrun on the next network read.
+    """
+    pending = bytearray(first_chunk)
+    primed = False
+
+    while True:
+        chunk = audio_queue.get()
+        if chunk is None:
+            break
+
+        pending.extend(chunk)
+        if not primed:
+            if len(pending) < prime_bytes:
+                continue
+            primed = True
+
+        while len(pending) >= block_bytes:
+            yield bytes(pending[:block_bytes])
+            del pending[:block_bytes]
+
+    # Flush whatever is left, dropping a dangling half-sample
+    del pending[len(pending) - len(pending) % 2:]
+    for offset in range(0, len(pending), block_bytes):
+        yield bytes(pending[offset:offset + block_bytes])
+
+
+MOUTH_FRAME_INTERVAL = 1 / 30  # mouth animation rate while speaking
+
+# Perceptual loudness curve log10(1 + 55*rms), clipped to 1.0, sampled
+# at 256 points so the per-frame mapping is a single list index
+_LOUDNESS_LUT = np.clip(np.log10(1 + 55 * np.linspace(0, 1, 256)), 0, 1).tolist()
+
+
+def _mouth_loop(color, done):
+    """Animate the mouth from the levels the playback callback publishes."""
+    global previous_audio_level
+
+    previous_num_lit = None
+
+    while not done.is_set():
+        # Average everything that has reached the speaker since the last frame
+        now = time.monotonic()
+        total = 0
+        count = 0
+        while _mouth_levels and _mouth_levels[0][0] <= now:
+            total += _mouth_levels.popleft()[1]
+            count += 1
+
+        if count:
+            rms = total / count / 32768.0
+            level = _LOUDNESS_LUT[min(255, int(rms * 256))]
+
+            level = (
+                MOUTH_SMOOTHING * previous_audio_level +
+                (1 - MOUTH_SMOOTHING) * level
+            )
 
-    return filename
+            previous_audio_level = level
 
+            # Only redraw when the number of lit LEDs actually changes
+            num_lit = int(round(level * NUM_PIXELS))
+            if num_lit != previous_num_lit:
+                show_mouth(level, color=color)
+                previous_num_lit = num_lit
 
-def speak_text(text, color=(0, 0, 255)):
-    """Speak via TTS and animate mouth with amplitude levels."""
-    global is_speaking, previous_audio_level
+        # Keep LED in sync with button even while speaking
+        update_listen_led_state()
+
+        time.sleep(MOUTH_FRAME_INTERVAL)
+
+    clear_mouth()
+
+
+def play_pcm(blocks, output_stream, color):
+    """Play 24 kHz PCM blocks at PLAYBACK_RATE while animating the mouth."""
+    # The stream and its deques are shared: one utterance at a time
+    with _speaker_lock:
+        chunk_bytes = PLAYBACK_CHUNK * _output_frame_bytes
+
+        _playback_chunks.clear()
+        _mouth_levels.clear()
+
+        done = threading.Event()
+        mouth_thread = threading.Thread(target=_mouth_loop, args=(color, done), daemon=True)
+        mouth_thread.start()
+
+        resample_state = None
+        pending = bytearray()
+
+        for block in blocks:
+            # Resample 24 kHz -> 48 kHz in-process (no ffmpeg round-trip)
+            data, resample_state = audioop.ratecv(
+                block, 2, 1, TTS_SAMPLE_RATE, PLAYBACK_RATE, resample_state
+            )
+            pending.extend(data)
 
-    is_speaking = True
+            while len(pending) >= chunk_bytes:
+                _playback_chunks.append(bytes(pending[:chunk_bytes]))
+                del pending[:chunk_bytes]
 
-    mp3_path = "speech_output.mp3"
-    wav_path = "speech_output.wav"
+            if _playback_chunks and output_stream.is_stopped():
+                output_stream.start_stream()
 
-    # Generate TTS
+        if pending:
+            _playback_chunks.append(bytes(pending))
+            if output_stream.is_stopped():
+                output_stream.start_stream()
+
+        # Wait until the callback has taken everything, then until it is heard
+        # (bounded, in case the stream dies with audio still queued)
+        drain_deadline = (
+            time.monotonic() + PLAYBACK_DRAIN_SLACK +
+            len(_playback_chunks) * PLAYBACK_CHUNK / PLAYBACK_RATE
+        )
+        while (
+            _playback_chunks
+            and output_stream.is_active()
+            and time.monotonic() < drain_deadline
+        ):
+            time.sleep(0.01)
+        time.sleep(_output_latency)
+
+        # Stop (but keep) the stream for the next utterance
+        if not output_stream.is_stopped():
+            output_stream.stop_stream()
+
+        done.set()
+        mouth_thread.join()
+
+
+# Blocks of 256 frames at 24 kHz become one 512-frame chunk at 48 kHz
+TTS_BLOCK_BYTES = PLAYBACK_CHUNK * TTS_SAMPLE_RATE // PLAYBACK_RATE * 2
+
+
+def _get_speaker_stream():
+    """Return the shared output stream for TTS audio, or None if no speaker."""
+    _, output_index = find_audio_devices()
+    if output_index is None:
+        print("❌ No speaker found.")
+        return None
+
+    return get_output_stream(
+        PLAYBACK_RATE,
+        1,  # mono
+        2,  # 16-bit samples
+        output_index,  # USB speaker index
+    )
+
+
+def tts_cache_path(phrase):
+    """On-disk location of the cached PCM for a phrase with the current voice."""
+    key = f"{TTS_MODEL}|{VOICE_NAME}|{phrase}"
+    return os.path.join(TTS_CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".pcm")
+
+
+def _download_phrase(phrase, path):
+    """Stream the TTS for phrase into path + ".tmp"."""
+    with client.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=VOICE_NAME,
+        input=phrase,
+        response_format="pcm"
+    ) as response:
+        response.stream_to_file(path + ".tmp")
+
+
+def precache_phrases(phrases):
+    """
+    Synthesize any phrase that is not cached yet (normally only on first run).
+    Runs in a daemon thread; an uncached phrase is simply synthesized when spoken.
+    """
     try:
-        with client.audio.speech.with_streaming_response.create(
-            model=TTS_MODEL,
-            voice=VOICE_NAME,
-            input=text
-        ) as response:
-            response.stream_to_file(mp3_path)
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️ Couldn't create the TTS cache ({e}): idle phrases will be synthesized when spoken.")
+        return
+
+    for phrase in phrases:
+        path = tts_cache_path(phrase)
+        if os.path.exists(path):
+            continue
+
+        try:
+            call_with_retry(_download_phrase, phrase, path)
+            # Rename only once complete so a partial file is never played
+            os.replace(path + ".tmp", path)
+        except Exception as e:
+            # Never leave a half-written file behind
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+            if isinstance(e, APIConnectionError):
+                print("⚠️ Couldn't reach TTS: idle phrases will be synthesized when spoken.")
+                return
+
+            print(f"⚠️ Couldn't cache \"{phrase}\": {e}")
+
+
+def speak_cached(path, color=(0, 0, 255)):
+    """Play a cached PCM phrase: no network, no OpenAI cost."""
+
+    with open(path, "rb") as pcm_file:
+        pcm = pcm_file.read()
+
+    state.is_speaking = True
+
+    output_stream = _get_speaker_stream()
+    if output_stream is not None:
+        blocks = (
+            pcm[offset:offset + TTS_BLOCK_BYTES]
+            for offset in range(0, len(pcm), TTS_BLOCK_BYTES)
+        )
+        play_pcm(blocks, output_stream, color)
+
+    state.is_speaking = False
+
+
+def _stream_tts(text, audio_queue):
+    """Request TTS for text and stream its PCM onto audio_queue."""
+    with client.audio.speech.with_streaming_response.create(
+        model=TTS_MODEL,
+        voice=VOICE_NAME,
+        input=text,
+        response_format="pcm"
+    ) as response:
         # If we got here, internet is working again
-        global is_offline
-        is_offline = False
+        state.is_offline = False
+        _download_tts(response, audio_queue)
 
-    except APIConnectionError:
+
+def _fetch_tts(text, audio_queue):
+    """Worker: _stream_tts() with rate-limit retries; any failure goes on the queue."""
+    try:
+        call_with_retry(_stream_tts, text, audio_queue)
+    except Exception as e:
+        audio_queue.put(e)
+        audio_queue.put(None)
+
+
+def fetch_tts(text):
+    """
+    Start synthesizing text in the background and return its queue at once:
+    PCM chunks then None, or the exception then None. Lets the next
+    sentence download while the current one is still playing.
+    """
+    audio_queue = queue.Queue()
+    threading.Thread(target=_fetch_tts, args=(text, audio_queue), daemon=True).start()
+    return audio_queue
+
+
+def speak_text(text, color=(0, 0, 255), audio_queue=None):
+    """
+    Speak via TTS and animate mouth with amplitude levels. audio_queue is a
+    fetch_tts(text) already in flight; otherwise the request starts here.
+    """
+
+    state.is_speaking = True
+
+    if audio_queue is None:
+        audio_queue = fetch_tts(text)
+
+    output_stream = _get_speaker_stream()
+    if output_stream is None:
+        state.is_speaking = False
+        return
+
+    prime_bytes = int(TTS_SAMPLE_RATE * TTS_PRIME_SECONDS) * 2
+
+    # The first item tells us whether the request got through at all
+    try:
+        first_chunk = audio_queue.get(timeout=TTS_FIRST_CHUNK_TIMEOUT)
+    except queue.Empty:
+        first_chunk = TimeoutError("no audio from TTS")
+
+    if isinstance(first_chunk, APIConnectionError):
         print("❌ No internet: cannot reach OpenAI for speech. Check Wi-Fi.")
         set_offline_face()
-        is_speaking = False
+        state.is_speaking = False
 
         # Optional: a visual “error” blink using the mouth LEDs
         for _ in range(3):
@@ -808,97 +1616,200 @@ def speak_text(text, color=(0, 0, 255)):
             time.sleep(0.25)
             clear_mouth()
             time.sleep(0.25)
-        is_speaking = False
         return
 
-    # Convert to mono WAV at 48kHz
-    subprocess.run(
-        ["ffmpeg", "-y", "-i", mp3_path, "-ac", "1", "-ar", "48000", wav_path],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
-
-    wave_file = wave.open(wav_path, 'rb')
-    audio_interface = pyaudio.PyAudio()
+    if isinstance(first_chunk, RateLimitError):
+        print("⚠️ OpenAI rate limit: speech skipped.")
+        state.is_speaking = False
+        return
 
-    _, output_index = find_audio_devices()
-    if output_index is None:
-        print("❌ No speaker found.")
+    if isinstance(first_chunk, Exception):
+        print(f"⚠️ Speech failed: {first_chunk}")
+        state.is_speaking = False
         return
 
-    output_stream = audio_interface.open(
-        format=audio_interface.get_format_from_width(wave_file.getsampwidth()),
-        channels=wave_file.getnchannels(),
-        rate=48000,
-        output=True,
-        output_device_index=output_index,  # USB speaker index
-    )
+    # Play it while it is still downloading
+    if first_chunk is not None:
+        play_pcm(
+            _iter_pcm_blocks(audio_queue, TTS_BLOCK_BYTES, prime_bytes, first_chunk),
+            output_stream,
+            color
+        )
 
-    chunk_size = 512
-    audio_playback_delay = 0.07  # lip-sync correction
+    state.is_speaking = False
 
-    data = wave_file.readframes(chunk_size)
-    playback_start_time = time.time() + audio_playback_delay
 
-    while data:
-        # Keep LED in sync with button even while speaking
-        update_listen_led_state()
+# ================================================================
+#  MAIN LOOP + EMOTION PROCESSING
+# ================================================================
 
-        rms = audioop.rms(data, 2) / 32768.0
-        level = min(1.0, np.log10(1 + 55 * rms))
+# A sentence ends at . ! or ? followed by whitespace
+SENTENCE_END = re.compile(r"[.!?]\s")
 
-        level = (
-            MOUTH_SMOOTHING * previous_audio_level +
-            (1 - MOUTH_SMOOTHING) * level
-        )
+# Emotion label the model puts in front of its reply
+_EMOTION_RE = re.compile(r"\[emotion:\s*(\w+)\]", re.IGNORECASE)
 
-        previous_audio_level = level
+# Easter-egg commands, checked in one pass over the (lowercased) text.
+# The wink alternative comes first, so it wins when both would match.
+# match() anchors at the start, which keeps a bare "wink" meaning
+# "starts with wink"; the other patterns lead with .* to match anywhere.
+EASTER_EGG_RE = re.compile(
+    r"(?P<wink>wink|.*wink for me|.*can you wink)"
+    r"|(?P<blink_twice>(?=.*blink twice).*understand)",
+    re.DOTALL
+)
 
-        show_mouth(level, color=color)
+EMOTION_COLORS = {
+    "happy": (0, 255, 255),      # yellow-ish
+    "sad": (255, 0, 0),          # blue
+    "angry": (0, 255, 0),        # red
+    "surprised": (255, 255, 0),  # purple
+    "neutral": (0, 255, 0),      # default green
+}
 
-        while time.time() < playback_start_time:
-            # Tight sync loop; could be relaxed if needed
-            pass
 
-        output_stream.write(data)
-        playback_start_time += chunk_size / wave_file.getframerate()
+def strip_emotion_label(text):
+    """Remove the "[emotion: ...]" label with a plain find/slice (no regex)."""
+    start = text.find("[emotion:")
+    if start < 0:
+        return text.strip()
 
-        data = wave_file.readframes(chunk_size)
+    end = text.find("]", start)
+    if end < 0:
+        return text[:start].strip()
 
-    clear_mouth()
-    output_stream.stop_stream()
-    output_stream.close()
-    audio_interface.terminate()
-    wave_file.close()
+    return (text[:start] + text[end + 1:]).strip()
 
-    os.remove(mp3_path)
-    os.remove(wav_path)
 
-    is_speaking = False
+def _put_sentence(sentences, sentence):
+    """Queue (sentence, reply_text, audio_queue), starting its TTS right away."""
+    reply_text = strip_emotion_label(sentence)
+    audio_queue = fetch_tts(reply_text) if reply_text else None
+    sentences.put((sentence, reply_text, audio_queue))
 
 
-# ================================================================
-#  MAIN LOOP + EMOTION PROCESSING
-# ================================================================
+# Queued instead of the last sentence when the reply hit CHAT_MAX_TOKENS
+REPLY_TRUNCATED = object()
+
+
+def _read_reply_sentences(stream, sentences):
+    """
+    Reader thread: collect a streaming chat reply and, for each complete
+    sentence, kick off its TTS and queue it for playback. An API or
+    connection error is passed along as the exception object, and a reply
+    cut off by the token cap as REPLY_TRUNCATED; None always marks the end.
+    """
+    buffer = ""
+    finish_reason = None
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+
+            buffer += delta
+            match = SENTENCE_END.search(buffer)
+            while match:
+                _put_sentence(sentences, buffer[:match.end()].strip())
+                buffer = buffer[match.end():]
+                match = SENTENCE_END.search(buffer)
+
+        if finish_reason == "length":
+            # The tail stops mid-sentence (often mid-word): don't speak it
+            sentences.put(REPLY_TRUNCATED)
+        elif buffer.strip():
+            _put_sentence(sentences, buffer.strip())
+    except (APIError, httpx.TransportError) as e:
+        # Drops mid-stream surface as raw httpx errors; server-side
+        # stream errors as APIError
+        sentences.put(e)
+    finally:
+        sentences.put(None)
+
+
+# Answers to repeated questions can be replayed instead of asking the model
+# again, keyed by the lowercased words of the question. Off by default since
+# a replay is always word-for-word; set a size (e.g. 128) to opt in.
+REPLY_CACHE_SIZE = 0
+_reply_cache = collections.OrderedDict()  # key -> (emotion, sentences)
+
+
+def reply_cache_key(norm):
+    """Cache key for a lowercased question: its words, ignoring punctuation."""
+    return " ".join(re.findall(r"[\w']+", norm))
+
+
+def cached_reply(key):
+    """(emotion, sentences) for a question answered before, or None."""
+    reply = _reply_cache.get(key)
+    if reply is not None:
+        _reply_cache.move_to_end(key)
+    return reply
+
+
+def remember_reply(key, emotion, sentences):
+    """Store a complete reply, evicting the least recently used past the limit."""
+    if REPLY_CACHE_SIZE <= 0 or not key or not sentences:
+        return
+
+    _reply_cache[key] = (emotion, tuple(sentences))
+    _reply_cache.move_to_end(key)
+    while len(_reply_cache) > REPLY_CACHE_SIZE:
+        _reply_cache.popitem(last=False)
+
+
+# Retry pacing: empty transcriptions ramp up linearly from a very short
+# pause; connection failures back off exponentially with full jitter
+EMPTY_BACKOFF_STEP = 0.05
+EMPTY_BACKOFF_MAX = 0.5
+OFFLINE_BACKOFF_BASE = 0.5
+OFFLINE_BACKOFF_MAX = 8.0
+
+
+def empty_backoff(streak):
+    """Pause after `streak` empty transcriptions in a row."""
+    return min(EMPTY_BACKOFF_MAX, EMPTY_BACKOFF_STEP * streak)
+
+
+def offline_backoff(streak):
+    """Pause after `streak` connection failures in a row (full jitter)."""
+    return random.uniform(0, min(OFFLINE_BACKOFF_MAX, OFFLINE_BACKOFF_BASE * 2 ** (streak - 1)))
+
+
+def show_chat_offline():
+    """Offline face plus a red mouth blink when the chat request fails."""
+    set_offline_face()
+    for _ in range(3):
+        show_mouth(1.0, color=(255, 0, 0))
+        time.sleep(0.25)
+        clear_mouth()
+        time.sleep(0.25)
+
 
 def update_listen_led_state():
     """
     LED logic (non-blinking decisions):
     - OFF if switch off
-    - BLINKING handled by led_blink_loop when busy
+    - BLINKING handled by led_step() in animation_loop when busy
     - SOLID ON when armed & ready
     """
-    global listen_led, is_armed, is_thinking, is_speaking
 
-    if not is_armed:
-        listen_led.value = False
-    elif not (is_thinking or is_speaking):
+    if not state.is_armed:
+        set_listen_led(False)
+    elif not (state.is_thinking or state.is_speaking):
         # Ready state
-        listen_led.value = True
+        set_listen_led(True)
+
+
+NO_MIC_RETRY_DELAY = 5.0  # pause between turns when no microphone was found
 
 
 def main():
-    global is_running, is_thinking, last_blink_timestamp, is_armed
+    # Handshake with OpenAI while the hardware initializes
+    threading.Thread(target=prewarm_connection, daemon=True).start()
 
     center_eyes()
     clear_mouth()
@@ -914,164 +1825,230 @@ def main():
         time.sleep(1)
 
     # Start background threads
-    eye_thread = threading.Thread(target=eyes_idle_loop)
-    eye_thread.start()
-
-    led_thread = threading.Thread(target=led_blink_loop)
-    led_thread.start()
+    animation_thread = threading.Thread(target=animation_loop)
+    animation_thread.start()
 
     idle_thread = threading.Thread(target=idle_speech_loop)
     idle_thread.start()
 
+    # Make sure the idle phrases can be replayed without a TTS round-trip
+    threading.Thread(target=precache_phrases, args=(IDLE_PHRASES,), daemon=True).start()
+
     # ▶️ Startup announcement
     speak_text("I'm ready. Press the button and ask me a question.", color=(0, 255, 0))
 
-    # Initialize armed state based on current button, but DO NOT move lids yet
-    button_on = not listen_button.value
-    is_armed = button_on
-    last_armed = button_on
+    # Initialize armed state based on current button, but DO NOT move lids yet;
+    # from here on the edge callbacks open/close the lids on every change
+    state.is_armed = not listen_button.value  # True = OFF
+    if state.is_armed:
+        armed_event.set()
+    notify_state_change()  # the animation thread is already waiting on this
+    start_button_events()
+
+    # Consecutive empty transcriptions / connection failures, for backoff
+    empty_streak = 0
+    offline_streak = 0
 
     try:
         while True:
-            # Update is_armed based on button
-            button_on = not listen_button.value
-            is_armed = button_on
-
-            # Only move eyelids when the state changes AFTER startup
-            if button_on != last_armed:
-                if button_on:
-                    set_eyelids_open()    # waking up
-                else:
-                    set_eyelids_closed()  # going to sleep
-                last_armed = button_on
-
             # Update LED based on current state
             update_listen_led_state()
 
-            # If switch is OFF: don't listen, just idle/sleep
-            if not button_on:
-                is_thinking = False
-                time.sleep(0.05)
+            # If switch is OFF: don't listen, just sleep until it flips ON.
+            # The timeout only bounds the wait; the LED is handled by the
+            # button callback.
+            if not armed_event.is_set():
+                state.is_thinking = False
+                armed_event.wait(timeout=1.0)
                 continue
 
             # Switch is ON: listen once
             print("🎤 Listening for speech...")
-            audio_path = record_audio()
+            audio_file = record_audio()
 
             # If recording was cancelled (button turned off or no audio), skip this turn
-            if audio_path is None:
-                is_thinking = False
+            if audio_file is None:
+                state.is_thinking = False
+                # No microphone at all: don't spin on the same failure
+                if find_audio_devices()[0] is None:
+                    time.sleep(NO_MIC_RETRY_DELAY)
                 continue
 
-            is_thinking = True
-            user_text = transcribe_audio(audio_path)
+            state.is_thinking = True
+            user_text = transcribe_audio(audio_file)
 
             print(f"🧑 You said: {user_text}")
 
-            os.remove(audio_path)
+            # Transcription failed on the network: back off harder each time
+            if state.is_offline:
+                offline_streak += 1
+                state.is_thinking = False
+                time.sleep(offline_backoff(offline_streak))
+                continue
+
+            # The API answered, so the network is back: restart the backoff
+            offline_streak = 0
 
             # 1️⃣ Completely empty / whitespace → ignore
             if not user_text or not user_text.strip():
                 print("⚠️ Nothing clear was transcribed; not sending to OpenAI.")
-                is_thinking = False
-                time.sleep(0.5)   # small pause so it doesn't spin too fast
+                state.is_thinking = False
+                empty_streak += 1
+                time.sleep(empty_backoff(empty_streak))   # short pause so it doesn't spin
                 continue
 
+            empty_streak = 0
+
             norm = user_text.lower().strip()
 
             # 2️⃣ Exit commands (must work even if short)
             if norm in ["quit", "exit", "stop"]:
-                is_running = False
-                pca.deinit()
+                state.is_running = False
+                notify_state_change()
+                with _i2c_lock:
+                    pca.deinit()
                 clear_mouth()
                 print("👋 Goodbye.")
                 break
 
             # 3️⃣ Easter eggs (also allowed even if short-ish)
-            if "wink for me" in norm or norm.startswith("wink") or "can you wink" in norm:
-                is_thinking = False
-                print("✨ Easter Egg: wink")
-                wink()
-                continue
-
-            if "blink twice" in norm and "understand" in norm:
-                is_thinking = False
-                print("✨ Easter Egg: blink twice")
-                blink_twice()
+            egg = EASTER_EGG_RE.match(norm)
+            if egg:
+                state.is_thinking = False
+                if egg.lastgroup == "wink":
+                    print("✨ Easter Egg: wink")
+                    wink()
+                else:
+                    print("✨ Easter Egg: blink twice")
+                    blink_twice()
                 continue
 
             # 4️⃣ Noise filter – ignore junk / room noise
             if not is_meaningful_text(user_text):
                 print("⚠️ Transcription looks like noise; ignoring.")
-                is_thinking = False
+                state.is_thinking = False
                 time.sleep(0.5)
                 continue
 
+            # ----------------------------------------------
+            # Repeated question: replay the earlier answer
+            # ----------------------------------------------
+            reply_key = reply_cache_key(norm)
+            cached = cached_reply(reply_key)
+            if cached:
+                emotion, cached_sentences = cached
+                color = EMOTION_COLORS.get(emotion, (0, 255, 0))
+                state.is_thinking = False
+
+                # Start every sentence's TTS now so each one is ready in turn
+                audio_queues = [fetch_tts(reply_text) for reply_text in cached_sentences]
+                for reply_text, audio_queue in zip(cached_sentences, audio_queues):
+                    print(f"🤖 {reply_text}  [{emotion}] (cached)")
+                    speak_text(reply_text, color=color, audio_queue=audio_queue)
+                continue
+
             # ----------------------------------------------
             # Normal conversation
             # ----------------------------------------------
             print("🤔 Thinking...")
 
             try:
-                response = client.chat.completions.create(
+                future = _chat_pool.submit(
+                    call_with_retry,
+                    client.chat.completions.create,
                     model=CHAT_MODEL,
-                    messages=[
-                        {"role": "system", "content": (
-                            "You are a calm, expressive AI. "
-                            "Respond concisely in 1 sentence unless necessary. "
-                            "Do NOT start with greetings like 'Hello', 'Hi', or 'How can I help you today?'. "
-                            "Just answer the user's request directly. "
-                            "Also output emotion as one of: happy, sad, neutral, angry, surprised. "
-                            "Format: <text> [emotion: <label>]"
-                        )},
-                        {"role": "user", "content": user_text},
-                    ]
+                    messages=[_SYS_MSG, {"role": "user", "content": user_text}],
+                    max_completion_tokens=CHAT_MAX_TOKENS,
+                    stream=True
                 )
-                global is_offline
-                is_offline = False
+
+                # Keep the LED following the switch while the request is in flight
+                while not future.done():
+                    update_listen_led_state()
+                    concurrent.futures.wait((future,), timeout=0.05)
+
+                stream = future.result()
+                state.is_offline = False
+                offline_streak = 0
 
             except APIConnectionError:
                 print("❌ No internet: cannot reach OpenAI for chat completion. Check Wi-Fi.")
-                # Optional visual feedback
-                set_offline_face()
-                for _ in range(3):
-                    show_mouth(1.0, color=(255, 0, 0))
-                    time.sleep(0.25)
-                    clear_mouth()
-                    time.sleep(0.25)
-                is_thinking = False
+                show_chat_offline()
+                state.is_thinking = False
+                offline_streak += 1
+                time.sleep(offline_backoff(offline_streak))
                 continue  # skip this turn and go back to waiting for the next question
 
+            except RateLimitError:
+                print("⚠️ OpenAI rate limit: skipping this question.")
+                state.is_thinking = False
+                continue
+
             # ----------------------------------------------
-            # Handle model response + emotion
+            # Handle model response + emotion, sentence by sentence
             # ----------------------------------------------
-            full_reply = response.choices[0].message.content.strip()
+            sentences = queue.Queue()
+            reader = threading.Thread(
+                target=_read_reply_sentences,
+                args=(stream, sentences),
+                daemon=True
+            )
+            reader.start()
+
+            emotion = None
+            spoken = []
+            cut_off = False
+
+            # Speak each sentence as soon as it arrives; the reader thread
+            # keeps pulling the rest of the reply while this one plays
+            while True:
+                item = sentences.get()
+                if item is None:
+                    break
+
+                if item is REPLY_TRUNCATED:
+                    cut_off = True
+                    break
+
+                if isinstance(item, Exception):
+                    if isinstance(item, (APIConnectionError, httpx.TransportError)):
+                        print("❌ No internet: chat reply was cut off. Check Wi-Fi.")
+                        show_chat_offline()
+                    else:
+                        print(f"⚠️ Chat reply was cut off: {item}")
+                    cut_off = True
+                    break
+
+                # reply_text has the label stripped; its TTS is already downloading
+                sentence, reply_text, audio_queue = item
 
-            # Extract emotion
-            match = re.search(r"\[emotion:\s*(\w+)\]", full_reply, re.IGNORECASE)
-            emotion = match.group(1).lower() if match else "neutral"
+                # The emotion label leads the reply, so it is in the first sentence
+                if emotion is None:
+                    match = _EMOTION_RE.search(sentence)
+                    emotion = match.group(1).lower() if match else "neutral"
+                    color = EMOTION_COLORS.get(emotion, (0, 255, 0))
 
-            # Strip label before TTS
-            reply_text = re.sub(r"\[emotion:.*\]", "", full_reply).strip()
+                if not reply_text:
+                    continue
 
-            EMOTION_COLORS = {
-                "happy": (0, 255, 255),      # yellow-ish
-                "sad": (255, 0, 0),          # blue
-                "angry": (0, 255, 0),        # red
-                "surprised": (255, 255, 0),  # purple
-                "neutral": (0, 255, 0),      # default green
-            }
+                state.is_thinking = False
 
-            color = EMOTION_COLORS.get(emotion, (0, 255, 0))
+                print(f"🤖 {reply_text}  [{emotion}]")
+                speak_text(reply_text, color=color, audio_queue=audio_queue)
+                spoken.append(reply_text)
 
-            is_thinking = False
+            reader.join()
+            state.is_thinking = False
 
-            print(f"🤖 {reply_text}  [{emotion}]")
-            speak_text(reply_text, color=color)
+            # Only complete replies are worth replaying
+            if not cut_off:
+                remember_reply(reply_key, emotion, spoken)
 
     except KeyboardInterrupt:
-        is_running = False
-        pca.deinit()
+        state.is_running = False
+        notify_state_change()
+        with _i2c_lock:
+            pca.deinit()
         clear_mouth()
         print("\n👋 Program stopped.")
 
@@ -160,6 +160,11 @@ def blink_eyes():
         time.sleep(BLINK_SPEED)
 
 
+def next_blink_deadline():
+    """Monotonic-ns deadline for the next auto-blink."""
+    return time.monotonic_ns() + int(random.uniform(*BLINK_INTERVAL) * 1e9)
+
+
 def wait_for_enter():
     """Block until user presses Enter to continue."""
     print("⚙️ Eyes centered. Press [Enter] to start animation...")
@@ -194,7 +199,7 @@ set_servo_angle(RIGHT_BLINK, DIR_RIGHT_BLINK, right_blink_open)
 
 wait_for_enter()
 
-next_blink_time = time.time() + random.uniform(*BLINK_INTERVAL)
+next_blink_ns = next_blink_deadline()
 print("👁️  Animatronic eyes running — press Ctrl+C to stop")
 
 
@@ -217,9 +222,9 @@ try:
         move_servos_together(targets, current_angles)
 
         # Auto-blink
-        if time.time() >= next_blink_time:
+        if time.monotonic_ns() >= next_blink_ns:
             blink_eyes()
-            next_blink_time = time.time() + random.uniform(*BLINK_INTERVAL)
+            next_blink_ns = next_blink_deadline()
 
         time.sleep(random.uniform(0.5, 2.0))
 